@@ -1,9 +1,12 @@
 """A script which will extracts and summarise how how long each calculation approach
 took to estimate a training data set at each iteration of an optimization.
 """
+import bisect
 import json
+import multiprocessing
 import os
 import re
+import sys
 from collections import defaultdict
 from datetime import datetime, timedelta
 from glob import glob
@@ -12,7 +15,62 @@ import click
 from dateutil import parser
 from nonbonded.library.utilities import temporary_cd
 from openff.evaluator.client import RequestResult
-from openff.evaluator.workflow import ProtocolSchema
+
+# The names of the calculation layers, which are used as keys throughout.
+SIMULATION_LAYER = "SimulationLayer"
+REWEIGHTING_LAYER = "ReweightingLayer"
+
+_STARTED_RE = re.compile(r"Started at (.*)")
+_LINE_TIME_RE = re.compile(r"(\d\d:\d\d:\d\d\.\d\d\d)\s")
+_EVENT_RE = re.compile(
+    r"(?P<time>\d\d:\d\d:\d\d\.\d\d\d)\sINFO\s+(?:"
+    r"Launching batch (?P<start_batch_id>[0-9a-z]+) using the (?P<layer>[a-zA-Z]+)\s|"
+    r"Finished server request (?P<end_batch_id>[0-9a-z]+)$|"
+    r"Received estimation request)"
+)
+
+_WORKER_LINE_RE = re.compile(r"([\d\-]+\s\d\d:\d\d:\d\d\.\d\d\d)\s")
+_EXECUTING_RE = re.compile(r"([\d\-]+\s[\d:.]+)\sINFO\s+Executing\s([0-9a-z|_]+)")
+_FINISHED_RE = re.compile(
+    r"^([\d\-]+\s[\d:.]+)\sINFO\s+([0-9a-z|_]+)\sfinished executing after "
+    r"([\d.]+)\sms"
+)
+_FAILED_RE = re.compile(
+    r"^([\d\-]+\s[\d:.]+)\sINFO\s+Protocol failed to execute:\s([0-9a-z|_]+)$"
+)
+
+
+def _parse_hms(time_string):
+    """Parses a fixed width ``HH:MM:SS.mmm`` time stamp into a tuple of its hour,
+    minute, second and microsecond. This is significantly faster than using
+    ``dateutil.parser.parse``.
+    """
+    return (
+        int(time_string[0:2]),
+        int(time_string[3:5]),
+        int(time_string[6:8]),
+        int(time_string[9:12]) * 1000,
+    )
+
+
+def _parse_ymd_hms(time_string):
+    """Parses a fixed width ``YYYY-MM-DD HH:MM:SS.mmm`` time stamp."""
+    return datetime(
+        int(time_string[0:4]),
+        int(time_string[5:7]),
+        int(time_string[8:10]),
+        int(time_string[11:13]),
+        int(time_string[14:16]),
+        int(time_string[17:19]),
+        int(time_string[20:23]) * 1000,
+    )
+
+
+def _bucket(dictionary, outer_key, inner_key, factory=dict):
+    """Returns ``dictionary[outer_key][inner_key]``, creating any missing levels
+    using ``setdefault`` rather than the slower nested ``defaultdict`` factories.
+    """
+    return dictionary.setdefault(outer_key, {}).setdefault(inner_key, factory())
 
 
 def parse_batch_timing_information():
@@ -22,111 +80,141 @@ def parse_batch_timing_information():
 
     output_file_path = output_file_paths[0]
 
+    # The date of the current line, and the time of the previous line, which are
+    # used to correct for dates not being logged. The date defaults to today if the
+    # output file does not record when the calculation started.
+    current_date = datetime.now()
+    previous_line_hms = None
+
+    current_iteration = -1
+
+    batch_start_times = {}
+    batch_end_times = {}
+
+    # The layer which each (iteration, batch id) pair was most recently launched in.
+    batch_layer_types = {}
+
     with open(output_file_path) as file:
-        output_file_lines = file.read().split("\n")
 
-    previous_line_time = None
+        for output_file_line in file:
 
-    start_datetime = None
-    current_iteration = -1
+            output_file_line = output_file_line.rstrip("\n")
 
-    batch_start_times = defaultdict(lambda: defaultdict(dict))
-    batch_end_times = defaultdict(lambda: defaultdict(dict))
+            # Determine which date the calculation begun on.
+            if "Started at" in output_file_line:
 
-    for output_file_line in output_file_lines:
+                started_at_match = _STARTED_RE.match(output_file_line)
 
-        # Determine which date the calculation begun on.
-        started_at_match = re.match(r"Started at (.*)", output_file_line)
+                if started_at_match is not None and previous_line_hms is None:
+                    current_date = parser.parse(started_at_match.group(1))
 
-        if started_at_match is not None:
-            start_datetime = parser.parse(started_at_match.group(1))
+            # Extract any timing information for the line if available, cheaply
+            # skipping lines which cannot start with a time stamp.
+            if (
+                len(output_file_line) < 13
+                or output_file_line[2] != ":"
+                or output_file_line[5] != ":"
+                or output_file_line[8] != "."
+            ):
+                continue
 
-        # Extract any timing information for the line if available.
-        line_time_match = re.match(r"(\d\d:\d\d:\d\d\.\d\d\d)\s", output_file_line)
+            line_time_match = _LINE_TIME_RE.match(output_file_line)
 
-        if not line_time_match:
-            continue
+            if not line_time_match:
+                continue
 
-        line_time = parser.parse(
-            line_time_match.group(1),
-            default=start_datetime if not previous_line_time else previous_line_time,
-        )
+            line_hms = _parse_hms(line_time_match.group(1))
 
-        # Correct for dates not being logged.
-        if previous_line_time and line_time - previous_line_time < timedelta(0):
-            line_time += timedelta(days=1)
+            # Correct for dates not being logged.
+            if previous_line_hms is not None and line_hms < previous_line_hms:
+                current_date += timedelta(days=1)
 
-        previous_line_time = line_time
+            previous_line_hms = line_hms
 
-        # Determine if the log is now describing a new iteration.
-        received_request_match = re.match(
-            r"([\d:.]+)\sINFO\s+Received estimation request", output_file_line
-        )
+            hour, minute, second, microsecond = line_hms
 
-        if received_request_match:
+            line_time = current_date.replace(
+                hour=hour, minute=minute, second=second, microsecond=microsecond
+            )
 
-            current_iteration += 1
-            continue
+            # Match any of the events of interest (a new request being received or
+            # a batch starting or finishing) using a single regular expression. The
+            # vast majority of lines are cheaply skipped before reaching this point.
+            if "INFO" not in output_file_line:
+                continue
 
-        # Check for any information about batch start or end times
-        start_time_match = re.match(
-            r"([\d:.]+)\sINFO\s+Launching batch ([0-9a-z]+) using the ([a-zA-Z]+)\s",
-            output_file_line,
-        )
-        end_time_match = re.match(
-            r"([\d:.]+)\sINFO\s+Finished server request ([0-9a-z]+)$", output_file_line
-        )
+            event_match = _EVENT_RE.match(output_file_line)
+
+            if event_match is None:
+                continue
 
-        # Check for batch start times
-        if start_time_match:
+            start_batch_id = event_match.group("start_batch_id")
+            end_batch_id = event_match.group("end_batch_id")
 
-            batch_id = start_time_match.group(2)
-            layer_type = start_time_match.group(3)
+            # Determine if the log is now describing a new iteration.
+            if start_batch_id is None and end_batch_id is None:
 
-            if any(
-                batch_id in batch_start_times[current_iteration][x]
-                for x in batch_start_times[current_iteration]
-            ):
+                current_iteration += 1
+                continue
+
+            # Check for batch start times
+            if start_batch_id is not None:
+
+                batch_id = sys.intern(start_batch_id)
+                layer_type = event_match.group("layer")
+
+                batch_key = (current_iteration, batch_id)
+                previous_layer_type = batch_layer_types.get(batch_key)
+
+                if previous_layer_type is not None:
+
+                    # Record the end time of the previous layer.
+                    _bucket(batch_end_times, current_iteration, previous_layer_type)[
+                        batch_id
+                    ] = line_time
 
-                # Record the end time of the previous layer.
-                previous_layer_type = next(iter(batch_start_times[current_iteration]))
-                batch_end_times[current_iteration][previous_layer_type][
+                batch_layer_types[batch_key] = layer_type
+
+                _bucket(batch_start_times, current_iteration, layer_type)[
                     batch_id
                 ] = line_time
 
-            batch_start_times[current_iteration][layer_type][batch_id] = line_time
+            # Check for batch end times
+            if end_batch_id is not None:
 
-        # Check for batch end times
-        if end_time_match:
+                batch_id = sys.intern(end_batch_id)
 
-            batch_id = end_time_match.group(2)
+                iteration_start_times = batch_start_times.get(current_iteration, {})
+                iteration_end_times = batch_end_times.get(current_iteration, {})
 
-            # Find the matching layer type
-            layer_types = {
-                layer_type
-                for layer_type in batch_start_times[current_iteration]
-                if (
-                    batch_id in batch_start_times[current_iteration][layer_type]
-                    and batch_id not in batch_end_times[current_iteration][layer_type]
-                )
-            }
+                # Find the matching layer type
+                layer_types = {
+                    layer_type
+                    for layer_type in iteration_start_times
+                    if (
+                        batch_id in iteration_start_times[layer_type]
+                        and batch_id not in iteration_end_times.get(layer_type, {})
+                    )
+                }
 
-            assert len(layer_types) > 0
+                assert len(layer_types) > 0
 
-            if len(layer_types) == 2:
-                layer_type = "ReweightingLayer"
-            else:
-                layer_type = [*layer_types][0]
+                if len(layer_types) == 2:
+                    layer_type = REWEIGHTING_LAYER
+                else:
+                    layer_type = [*layer_types][0]
 
-            batch_end_times[current_iteration][layer_type][batch_id] = line_time
+                _bucket(batch_end_times, current_iteration, layer_type)[
+                    batch_id
+                ] = line_time
 
-    batch_timings = defaultdict(lambda: defaultdict(dict))
+    batch_timings = {}
 
     # Validate and consolidate the timings.
     for current_iteration in batch_start_times:
 
         assert {*batch_start_times[current_iteration]} == {
-            *batch_end_times[current_iteration]
+            *batch_end_times.get(current_iteration, {})
         }
 
         for layer_type in batch_start_times[current_iteration]:
@@ -146,7 +234,7 @@ def parse_batch_timing_information():
 
                 assert batch_end_time > batch_start_time
 
-                batch_timings[current_iteration][layer_type][batch_id] = (
+                _bucket(batch_timings, current_iteration, layer_type)[batch_id] = (
                     batch_start_time + timedelta(seconds=-1),
                     batch_end_time + timedelta(seconds=1),
                 )
@@ -154,49 +242,51 @@ def parse_batch_timing_information():
     return batch_timings
 
 
-def parse_protocol_timing_information():
-
-    per_protocol_timings = defaultdict(list)
-
-    for log_file in glob("worker-logs/*.log"):
+def _parse_worker_log(log_file):
+    """Extracts the (start, end) times of each protocol executed by a single worker
+    from its log file.
+    """
 
-        protocol_start_times = {}
-        protocol_end_times = {}
+    protocol_start_times = {}
+    protocol_end_times = {}
 
-        with open(log_file) as file:
-            log_lines = file.read().split("\n")
+    with open(log_file) as file:
 
-        initial_time = parser.parse(
-            re.match(r"([\d\-]+\s\d\d:\d\d:\d\d\.\d\d\d)\s", log_lines[0]).group(1),
-        )
+        initial_time = _parse_ymd_hms(_WORKER_LINE_RE.match(file.readline()).group(1))
+        file.seek(0)
 
         worker_close_time = initial_time + timedelta(hours=5, minutes=59)
 
         protocol_started = None
 
-        for log_line in log_lines:
+        for log_line in file:
 
-            start_time_match = re.match(
-                r"([\d\-]+\s[\d:.]+)\sINFO\s+Executing\s([0-9a-z|_]+)", log_line
-            )
-            end_time_match = re.match(
-                r"^([\d\-]+\s[\d:.]+)\sINFO\s+([0-9a-z|_]+)\sfinished executing after "
-                r"([\d.]+)\sms",
-                log_line,
-            )
+            # Cheaply skip any lines which do not start with a date.
+            if len(log_line) < 23 or log_line[4] != "-" or log_line[7] != "-":
+                continue
 
-            if not end_time_match:
+            # Split the line into its date, time, log level and the start of the
+            # message so that only the relevant pattern needs to be matched.
+            line_parts = log_line.split(None, 4)
 
-                end_time_match = re.match(
-                    r"^([\d\-]+\s[\d:.]+)\sINFO\s+Protocol failed to execute:\s([0-9a-z|_]+)$",
-                    log_line,
-                )
+            if len(line_parts) < 5 or line_parts[2] != "INFO":
+                continue
+
+            message_type = line_parts[3]
+
+            start_time_match = (
+                _EXECUTING_RE.match(log_line) if message_type == "Executing" else None
+            )
+            end_time_match = None
+
+            if message_type == "Protocol":
+                end_time_match = _FAILED_RE.match(log_line)
+            elif line_parts[4].startswith("finished executing after"):
+                end_time_match = _FINISHED_RE.match(log_line)
 
             if start_time_match:
 
-                start_time = parser.parse(
-                    start_time_match.group(1), default=initial_time
-                )
+                start_time = _parse_ymd_hms(start_time_match.group(1))
                 if start_time < initial_time:
                     start_time += timedelta(days=1)
 
@@ -210,7 +300,7 @@ def parse_protocol_timing_information():
 
             elif end_time_match:
 
-                end_time = parser.parse(end_time_match.group(1), default=initial_time)
+                end_time = _parse_ymd_hms(end_time_match.group(1))
                 if end_time < initial_time:
                     end_time += timedelta(days=1)
 
@@ -222,12 +312,36 @@ def parse_protocol_timing_information():
                 protocol_started = None
                 protocol_end_times[protocol_id] = end_time
 
-        for protocol_id in protocol_start_times:
+    return {
+        protocol_id: (
+            protocol_start_times[protocol_id],
+            protocol_end_times.get(protocol_id, worker_close_time),
+        )
+        for protocol_id in protocol_start_times
+    }
+
+
+def parse_protocol_timing_information():
+
+    per_protocol_timings = defaultdict(list)
+
+    log_files = glob("worker-logs/*.log")
+
+    # The worker logs are independent so parse them in parallel where there are
+    # enough of them to outweigh the cost of starting the worker processes.
+    if len(log_files) > 4:
+
+        with multiprocessing.Pool() as pool:
+            worker_timings = [*pool.imap(_parse_worker_log, log_files)]
 
-            start_time = protocol_start_times[protocol_id]
-            end_time = protocol_end_times.get(protocol_id, worker_close_time)
+    else:
+
+        worker_timings = [*map(_parse_worker_log, log_files)]
+
+    for protocol_timings in worker_timings:
 
-            per_protocol_timings[protocol_id].append((start_time, end_time))
+        for protocol_id, protocol_times in protocol_timings.items():
+            per_protocol_timings[protocol_id].append(protocol_times)
 
     return per_protocol_timings
 
@@ -235,34 +349,38 @@ def parse_protocol_timing_information():
 def extract_batch_id(fidelity, protocol_schemas):
     """Extracts the id of the batch which a physical property was computed as part of
     based on the protocols used to estimate it.
+
+    The protocol schemas are the raw (i.e. JSON decoded) dictionaries stored in the
+    properties provenance, which avoids fully deserializing each schema when only
+    its id and a single input are required.
     """
 
     batch_id = None
 
-    if fidelity == "ReweightingLayer":
+    if fidelity == REWEIGHTING_LAYER:
 
         for protocol_schema in protocol_schemas:
 
-            if "unpack_data" not in protocol_schema.id:
+            if "unpack_data" not in protocol_schema["id"]:
                 continue
 
-            simulation_data_path = protocol_schema.inputs[".simulation_data_path"][0]
+            simulation_data_path = protocol_schema["inputs"][".simulation_data_path"][0]
 
             if isinstance(simulation_data_path, list):
                 simulation_data_path = simulation_data_path[0]
 
             simulation_data_path_split = simulation_data_path.split("/")
 
-            layer_id_index = simulation_data_path_split.index("ReweightingLayer")
+            layer_id_index = simulation_data_path_split.index(REWEIGHTING_LAYER)
 
-            batch_id = simulation_data_path_split[layer_id_index + 1]
+            batch_id = sys.intern(simulation_data_path_split[layer_id_index + 1])
 
     else:
 
         batch_id = [
-            protocol.inputs[".force_field_path"].split("/")[2]
+            sys.intern(protocol["inputs"][".force_field_path"].split("/")[2])
             for protocol in protocol_schemas
-            if "assign_parameters" in protocol.id
+            if "assign_parameters" in protocol["id"]
         ][0]
 
     assert batch_id is not None
@@ -273,6 +391,11 @@ def parse_iteration_statistics(batch_timings, protocol_timings):
 
     n_iterations = len(batch_timings)
 
+    # Sort the execution times of each protocol by their start time so that those
+    # which fall within a given time window can be found using a binary search.
+    for protocol_times in protocol_timings.values():
+        protocol_times.sort()
+
     all_statistics = []
 
     for iteration in range(n_iterations):
@@ -284,12 +407,12 @@ def parse_iteration_statistics(batch_timings, protocol_timings):
 
         # Create an object to store the statistics for this iteration in.
         statistics = {
-            "approach_counts": {"SimulationLayer": 0, "ReweightingLayer": 0},
+            "approach_counts": {SIMULATION_LAYER: 0, REWEIGHTING_LAYER: 0},
             "approach_counts_per_property": {
-                "SimulationLayer": defaultdict(int),
-                "ReweightingLayer": defaultdict(int),
+                SIMULATION_LAYER: defaultdict(int),
+                REWEIGHTING_LAYER: defaultdict(int),
             },
-            "time_per_approach": {"SimulationLayer": 0.0, "ReweightingLayer": 0.0},
+            "time_per_approach": {SIMULATION_LAYER: 0.0, REWEIGHTING_LAYER: 0.0},
         }
 
         # Extract timing and count information for each of the different
@@ -298,7 +421,7 @@ def parse_iteration_statistics(batch_timings, protocol_timings):
         # a property estimate i.e reweighting protocols were executed,
         # but ultimately there was not enough effective samples to use the
         # reweighted value.
-        batch_protocols = defaultdict(lambda: defaultdict(set))
+        batch_protocols = {}
 
         for physical_property in results.estimated_properties.properties:
 
@@ -312,15 +435,12 @@ def parse_iteration_statistics(batch_timings, protocol_timings):
             # Determine which batch this property was calculated as part of.
             provenance = json.loads(physical_property.source.provenance)
 
-            protocol_schemas = [
-                ProtocolSchema.parse_json(json.dumps(x))
-                for x in provenance["protocol_schemas"]
-            ]
+            protocol_schemas = provenance["protocol_schemas"]
 
-            protocol_ids = [x.id for x in protocol_schemas]
+            protocol_ids = [x["id"] for x in protocol_schemas]
             batch_id = extract_batch_id(fidelity, protocol_schemas)
 
-            batch_protocols[fidelity][batch_id].update(protocol_ids)
+            _bucket(batch_protocols, fidelity, batch_id, set).update(protocol_ids)
 
         for fidelity in batch_protocols:
             for batch_id in batch_protocols[fidelity]:
@@ -335,26 +455,39 @@ def parse_iteration_statistics(batch_timings, protocol_timings):
                 for protocol_id in protocol_ids:
 
                     protocol_times = protocol_timings[protocol_id]
-                    times_to_remove = []
 
-                    for protocol_start_time, protocol_end_time in protocol_times:
+                    # Only visit the times which started within this batch, and
+                    # retain only those which did not also end within it.
+                    lower_index = bisect.bisect_left(
+                        protocol_times, (batch_start_time,)
+                    )
+                    upper_index = lower_index
+
+                    remaining_times = []
+
+                    while (
+                        upper_index < len(protocol_times)
+                        and protocol_times[upper_index][0] <= batch_end_time
+                    ):
+
+                        protocol_time = protocol_times[upper_index]
+                        upper_index += 1
+
+                        protocol_start_time, protocol_end_time = protocol_time
 
                         if (
-                            protocol_start_time < batch_start_time
-                            or protocol_start_time > batch_end_time
-                            or protocol_end_time < batch_start_time
+                            protocol_end_time < batch_start_time
                             or protocol_end_time > batch_end_time
                         ):
+                            remaining_times.append(protocol_time)
                             continue
 
                         approach_time += (
                             protocol_end_time - protocol_start_time
                         ).total_seconds()
 
-                        times_to_remove.append((protocol_start_time, protocol_end_time))
-
-                    for time_to_remove in times_to_remove:
-                        protocol_times.remove(time_to_remove)
+                    if len(remaining_times) != upper_index - lower_index:
+                        protocol_times[lower_index:upper_index] = remaining_times
 
                 statistics["time_per_approach"][fidelity] += approach_time
 
@@ -362,30 +495,38 @@ def parse_iteration_statistics(batch_timings, protocol_timings):
 
         # Tally up the total execution times of protocols which were executed,
         # but which did not ultimately lead to a property estimate.
-        iteration_start_time = min(
-            batch_timings[iteration][layer_type][batch_id][0]
-            for layer_type in batch_timings[iteration]
-            for batch_id in batch_timings[iteration][layer_type]
-        )
-        iteration_end_time = max(
-            batch_timings[iteration][layer_type][batch_id][1]
-            for layer_type in batch_timings[iteration]
-            for batch_id in batch_timings[iteration][layer_type]
-        )
+        iteration_start_time = None
+        iteration_end_time = None
+
+        for layer_batch_timings in batch_timings[iteration].values():
+
+            for batch_start_time, batch_end_time in layer_batch_timings.values():
+
+                if (
+                    iteration_start_time is None
+                    or batch_start_time < iteration_start_time
+                ):
+                    iteration_start_time = batch_start_time
+
+                if iteration_end_time is None or batch_end_time > iteration_end_time:
+                    iteration_end_time = batch_end_time
 
         unused_protocol_time = 0.0
 
-        for protocol_id in protocol_timings:
+        for protocol_times in protocol_timings.values():
 
-            if len(protocol_timings[protocol_id]) == 0:
-                continue
+            upper_index = bisect.bisect_left(protocol_times, (iteration_start_time,))
+
+            while (
+                upper_index < len(protocol_times)
+                and protocol_times[upper_index][0] <= iteration_end_time
+            ):
 
-            for protocol_start_time, protocol_end_time in protocol_timings[protocol_id]:
+                protocol_start_time, protocol_end_time = protocol_times[upper_index]
+                upper_index += 1
 
                 if (
-                    protocol_start_time < iteration_start_time
-                    or protocol_start_time > iteration_end_time
-                    or protocol_end_time < iteration_start_time
+                    protocol_end_time < iteration_start_time
                     or protocol_end_time > iteration_end_time
                 ):
                     continue
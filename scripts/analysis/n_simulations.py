@@ -12,12 +12,19 @@ from openff.evaluator.protocols.openmm import OpenMMSimulation
 from openff.evaluator.workflow import ProtocolGroup
 
 
-def find_simulation_protocols(protocols_to_search, found_protocols):
+def find_simulation_protocols(protocols_to_search):
+    """Finds all of the production simulation protocols, including those nested
+    within protocol groups."""
 
-    for protocol in protocols_to_search:
+    found_protocols = []
+    protocol_stack = [*protocols_to_search]
+
+    while len(protocol_stack) > 0:
+
+        protocol = protocol_stack.pop()
 
         if isinstance(protocol, ProtocolGroup):
-            find_simulation_protocols(protocol.protocols.values(), found_protocols)
+            protocol_stack.extend(protocol.protocols.values())
             continue
 
         if not isinstance(protocol, OpenMMSimulation):
@@ -28,6 +35,8 @@ def find_simulation_protocols(protocols_to_search, found_protocols):
 
         found_protocols.append(protocol)
 
+    return found_protocols
+
 
 @click.argument(
     "data_set_paths",
@@ -64,9 +73,7 @@ def main(data_set_paths):
         ),
     )
 
-    simulation_protocols = []
-
-    find_simulation_protocols(workflow_graph.protocols.values(), simulation_protocols)
+    simulation_protocols = find_simulation_protocols(workflow_graph.protocols.values())
 
     print("Estimated simulations required: ", len({x.id for x in simulation_protocols}))
 
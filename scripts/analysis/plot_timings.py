@@ -4,6 +4,7 @@ import json
 import os
 
 import click
+import numpy
 import pandas
 import seaborn
 from matplotlib import pyplot
@@ -17,7 +18,11 @@ FORMAT = "pdf"
 def plot_approach_timings(iteration_statistics, average, output_path):
 
     # Reshape the statistics into a pandas data frame.
-    data_rows = []
+    n_iterations = len(iteration_statistics)
+
+    simulation_times = numpy.empty(n_iterations)
+    reweighting_times = numpy.empty(n_iterations)
+    overhead_times = numpy.empty(n_iterations)
 
     for iteration, statistics in enumerate(iteration_statistics):
 
@@ -36,20 +41,19 @@ def plot_approach_timings(iteration_statistics, average, output_path):
 
             overhead_time = overhead_time / max(simulation_count, 1)
 
-        data_row = {
-            "Iteration": iteration,
-            "Simulation": simulation_time / 60.0,
-        }
-
-        data_row["Reweighting"] = reweighting_time / 60.0
-        data_row["Overhead"] = overhead_time / 60.0
-
-        data_rows.append(data_row)
-
-    data_frame = pandas.DataFrame(data_rows)
-    data_frame.set_index("Iteration").plot(
-        kind="bar", stacked=True, width=1, figsize=(4.3, 4)
+        simulation_times[iteration] = simulation_time
+        reweighting_times[iteration] = reweighting_time
+        overhead_times[iteration] = overhead_time
+
+    data_frame = pandas.DataFrame(
+        {
+            "Simulation": simulation_times / 60.0,
+            "Reweighting": reweighting_times / 60.0,
+            "Overhead": overhead_times / 60.0,
+        },
+        index=pandas.RangeIndex(n_iterations, name="Iteration"),
     )
+    data_frame.plot(kind="bar", stacked=True, width=1, figsize=(4.3, 4))
 
     if not average:
         pyplot.ylim((0.0, 4500.0))
@@ -63,7 +67,12 @@ def plot_approach_timings(iteration_statistics, average, output_path):
 def plot_approach_counts(iteration_statistics, output_path):
 
     # Reshape the statistics into a pandas data frame.
-    data_rows = []
+    property_types = ["Density", "EnthalpyOfVaporization"]
+
+    n_iterations = len(iteration_statistics)
+    n_rows = n_iterations * len(property_types)
+
+    percentages_reweighted = numpy.empty(n_rows)
 
     for iteration, statistics in enumerate(iteration_statistics):
 
@@ -74,7 +83,7 @@ def plot_approach_counts(iteration_statistics, output_path):
             "ReweightingLayer"
         ]
 
-        for property_type in ["Density", "EnthalpyOfVaporization"]:
+        for property_index, property_type in enumerate(property_types):
 
             if (
                 property_type in reweighting_counts
@@ -91,15 +100,16 @@ def plot_approach_counts(iteration_statistics, output_path):
             else:
                 percentage_reweighted = 0.0
 
-            data_rows.append(
-                {
-                    "Iteration": iteration,
-                    "Property Type": property_type,
-                    "% Reweighted": percentage_reweighted,
-                }
-            )
+            row_index = iteration * len(property_types) + property_index
+            percentages_reweighted[row_index] = percentage_reweighted
 
-    data_frame = pandas.DataFrame(data_rows)
+    data_frame = pandas.DataFrame(
+        {
+            "Iteration": numpy.repeat(numpy.arange(n_iterations), len(property_types)),
+            "Property Type": property_types * n_iterations,
+            "% Reweighted": percentages_reweighted,
+        }
+    )
 
     seaborn.catplot(
         x="Iteration",
@@ -121,31 +131,32 @@ def plot_approach_counts(iteration_statistics, output_path):
 
 def plot_cumulative_time(optimization_statistics, output_path):
 
-    data_rows = []
+    simulation_statistics = optimization_statistics["simulation-only"]
+    reweighting_statistics = optimization_statistics["simulation-reweighting"]
 
-    total_simulated_time = 0.0
-    total_reweighted_time = 0.0
+    n_iterations = min(len(simulation_statistics), len(reweighting_statistics))
 
-    for iteration, (simulation_statistics, reweighting_statistics) in enumerate(
-        zip(
-            optimization_statistics["simulation-only"],
-            optimization_statistics["simulation-reweighting"],
-        )
-    ):
-
-        total_simulated_time += simulation_statistics["total_time"]
-        total_reweighted_time += reweighting_statistics["total_time"]
-
-        data_row = {
-            "Iteration": str(iteration),
-            "Simulation Only": total_simulated_time / 60.0,
-            "Simulation + Reweighting": total_reweighted_time / 60.0,
-        }
-
-        data_rows.append(data_row)
+    simulated_times = numpy.fromiter(
+        (x["total_time"] for x in simulation_statistics[:n_iterations]),
+        dtype=float,
+        count=n_iterations,
+    )
+    reweighted_times = numpy.fromiter(
+        (x["total_time"] for x in reweighting_statistics[:n_iterations]),
+        dtype=float,
+        count=n_iterations,
+    )
 
-    data_frame = pandas.DataFrame(data_rows)
-    data_frame.set_index("Iteration").plot(figsize=(4.3, 4))
+    data_frame = pandas.DataFrame(
+        {
+            "Simulation Only": numpy.cumsum(simulated_times) / 60.0,
+            "Simulation + Reweighting": numpy.cumsum(reweighted_times) / 60.0,
+        },
+        index=pandas.Index(
+            [str(iteration) for iteration in range(n_iterations)], name="Iteration"
+        ),
+    )
+    data_frame.plot(figsize=(4.3, 4))
 
     pyplot.ylabel("Cumulative Time (m)")
     pyplot.tight_layout()
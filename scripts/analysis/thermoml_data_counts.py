@@ -3,6 +3,7 @@ for different physical properties in the ThermoML archive."""
 import os
 
 import click
+import numpy
 import pandas
 from openff.evaluator.datasets.curation.components import thermoml
 
@@ -13,7 +14,22 @@ def main():
     # Download and import all of the readable entries from ThermoML. A local
     # copy is cached to make re-running this script faster.
     if os.path.isfile("thermoml.csv"):
-        thermoml_data_frame = pandas.read_csv("thermoml.csv")
+
+        # Only load the columns which are required to count the data points.
+        header = pandas.read_csv("thermoml.csv", nrows=0).columns
+        columns = ["N Components"] + [x for x in header if x.find(" Value ") >= 0]
+
+        read_options = dict(usecols=columns, dtype={"N Components": "int8"})
+
+        # Use the (multi-threaded) pyarrow parser where it is available, falling
+        # back to the default parser if pyarrow is not installed or pandas is too
+        # old (< 1.4) to support it.
+        try:
+            thermoml_data_frame = pandas.read_csv(
+                "thermoml.csv", engine="pyarrow", **read_options
+            )
+        except (ImportError, ValueError):
+            thermoml_data_frame = pandas.read_csv("thermoml.csv", **read_options)
     else:
         thermoml_data_frame = thermoml.ImportThermoMLData.apply(
             pandas.DataFrame(), thermoml.ImportThermoMLDataSchema(), 4
@@ -24,22 +40,18 @@ def main():
     # evaluator.
     property_headers = [x for x in thermoml_data_frame if x.find(" Value ") >= 0]
 
-    for property_header in property_headers:
-
-        property_type = property_header.split(" ")[0]
+    # Tally the number of measured values per property and number of components
+    # using a single mask of which values are present.
+    value_mask = thermoml_data_frame[property_headers].notna().to_numpy()
+    n_components = thermoml_data_frame["N Components"].to_numpy()
 
-        property_data = thermoml_data_frame[
-            thermoml_data_frame[property_header].notna()
-        ]
+    property_counts = numpy.stack(
+        [value_mask[n_components == i].sum(axis=0) for i in [1, 2, 3]], axis=1
+    )
 
-        counts = []
+    for property_header, counts in zip(property_headers, property_counts):
 
-        for n_components in [1, 2, 3]:
-
-            component_data = property_data[
-                property_data["N Components"] == n_components
-            ]
-            counts.append(len(component_data))
+        property_type = property_header.split(" ")[0]
 
         counts_string = " ".join(map(str, counts))
         print(f"{property_type} {counts_string}")
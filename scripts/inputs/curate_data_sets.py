@@ -1,9 +1,12 @@
+import functools
+import hashlib
 import os
 
 import pandas
 from nonbonded.library.models.authors import Author
 from nonbonded.library.models.datasets import DataSet
 from nonbonded.library.utilities.environments import ChemicalEnvironment
+from openff import evaluator
 from openff.evaluator.datasets.curation.components import (
     conversion,
     filtering,
@@ -24,24 +27,222 @@ AUTHORS = [
     ),
 ]
 
-N_PROCESSES = 4
+# The number of processes to use when importing and curating the data. This
+# defaults to the number of CPUs available to this process (respecting any affinity
+# restrictions where these can be queried), but can be overridden by setting the
+# CURATE_N_PROCESSES environment variable.
+if hasattr(os, "sched_getaffinity"):
+    N_AVAILABLE_CPUS = len(os.sched_getaffinity(0))
+else:
+    N_AVAILABLE_CPUS = os.cpu_count() or 4
 
+N_PROCESSES = int(os.environ.get("CURATE_N_PROCESSES", N_AVAILABLE_CPUS))
 
-def main():
+# The directory to cache the output of each stage of the curation workflow in.
+CACHE_DIRECTORY = os.path.join("cache", "curation")
+# The version of the cached stage outputs. This should be incremented whenever the
+# way in which the stages are applied by this script changes.
+CACHE_VERSION = 2
+
+# The filters which retain only the data points whose state lies within a range.
+# Adjacent filters of these types are applied together as a single stage.
+RANGE_FILTERS = {
+    filtering.FilterByTemperatureSchema,
+    filtering.FilterByPressureSchema,
+}
+
+# The filters which depend only upon the substance (i.e. the components) which a data
+# point was measured for. Adjacent filters of these types are applied to a single
+# data point per unique substance, so that each substance is only parsed and checked
+# once per filter, rather than once per data point.
+SUBSTANCE_FILTERS = {
+    filtering.FilterByStereochemistrySchema,
+    filtering.FilterByChargedSchema,
+    filtering.FilterByIonicLiquidSchema,
+    filtering.FilterByElementsSchema,
+    filtering.FilterByEnvironmentsSchema,
+}
+
+
+def _substance_keys(data_frame):
+    """Returns an index which uniquely identifies the substance (i.e. the components
+    and their roles) that each data point in a data frame was measured for.
+    """
+
+    n_components = int(data_frame["N Components"].max())
+
+    substance_columns = ["N Components"] + [
+        column
+        for index in range(n_components)
+        for column in (f"Component {index + 1}", f"Role {index + 1}")
+        if column in data_frame
+    ]
+
+    return pandas.MultiIndex.from_frame(data_frame[substance_columns].fillna(""))
+
+
+def filter_by_substance(data_frame, component_schemas, n_processes):
+    """Applies a list of substance based filters (see ``SUBSTANCE_FILTERS``) to one
+    data point per unique substance, and then retains only those data points which
+    were measured for a substance which passed the filters.
+    """
+
+    if len(data_frame) == 0:
+        return data_frame
+
+    substance_keys = _substance_keys(data_frame)
+
+    substance_data_frame = data_frame[~substance_keys.duplicated()]
+    substance_data_frame = CurationWorkflow.apply(
+        substance_data_frame,
+        CurationWorkflowSchema(component_schemas=component_schemas),
+        n_processes,
+    )
+
+    if len(substance_data_frame) == 0:
+        return substance_data_frame
+
+    retained_keys = _substance_keys(substance_data_frame)
+
+    return data_frame[substance_keys.isin(retained_keys)]
+
+
+def _stage_type(component_schema):
+    """Returns the filter set which a component may be grouped into a stage by, or
+    ``None`` if the component should be applied on its own.
+    """
+
+    for filter_types in (RANGE_FILTERS, SUBSTANCE_FILTERS):
+
+        if type(component_schema) in filter_types:
+            return filter_types
+
+    return None
+
+
+def group_curation_stages(component_schemas):
+    """Groups a list of curation components into the stages they will be applied in,
+    such that adjacent range filters, or adjacent substance filters, are applied
+    together and all other components are applied individually.
+    """
+
+    stages = []
+
+    for component_schema in component_schemas:
+
+        stage_type = _stage_type(component_schema)
+
+        if (
+            len(stages) > 0
+            and stage_type is not None
+            and stage_type is _stage_type(stages[-1][0])
+        ):
+            stages[-1].append(component_schema)
+            continue
+
+        stages.append([component_schema])
+
+    return stages
+
+
+def apply_curation_stage(data_frame, stage_schemas, n_processes):
+    """Applies a single stage of curation components (see ``group_curation_stages``)
+    to a data frame.
+    """
+
+    if _stage_type(stage_schemas[0]) is SUBSTANCE_FILTERS:
+        return filter_by_substance(data_frame, stage_schemas, n_processes)
+
+    return CurationWorkflow.apply(
+        data_frame,
+        CurationWorkflowSchema(component_schemas=stage_schemas),
+        n_processes,
+    )
+
+
+def cached_parquet(path, build_function):
+    """Loads a data frame from a parquet file if it exists, or otherwise builds it
+    with ``build_function`` and atomically writes it to that file.
+    """
 
-    if os.path.isfile("thermoml.csv"):
-        thermoml_data_frame = pandas.read_csv("thermoml.csv")
-    else:
-        thermoml_data_frame = thermoml.ImportThermoMLData.apply(
-            pandas.DataFrame(), thermoml.ImportThermoMLDataSchema(), N_PROCESSES
+    if os.path.isfile(path):
+        return pandas.read_parquet(path)
+
+    data_frame = build_function()
+
+    temporary_path = f"{path}.tmp"
+    data_frame.to_parquet(temporary_path)
+    os.replace(temporary_path, path)
+
+    return data_frame
+
+
+def apply_curation_components(data_frame, component_schemas, n_processes, cache_key):
+    """Applies a list of curation components to a data frame stage by stage (see
+    ``group_curation_stages``), caching the output of each stage to disk.
+    """
+
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+
+    # Key each stage by the input data, the versions of this script's cache and of
+    # the evaluator (which defines what each component does), and all of the
+    # components applied so far.
+    stage_hash = hashlib.sha1(
+        f"{CACHE_VERSION}:{evaluator.__version__}:{cache_key}".encode()
+    )
+
+    for stage_schemas in group_curation_stages(component_schemas):
+
+        for component_schema in stage_schemas:
+            stage_hash.update(component_schema.json().encode())
+
+        cache_path = os.path.join(CACHE_DIRECTORY, f"{stage_hash.hexdigest()}.parquet")
+
+        data_frame = cached_parquet(
+            cache_path,
+            functools.partial(
+                apply_curation_stage, data_frame, stage_schemas, n_processes
+            ),
         )
-        thermoml_data_frame.to_csv("thermoml.csv", index=False)
+
+    return data_frame
+
+
+def import_thermoml_data():
+    """Imports all of the readable entries from the ThermoML archive."""
+
+    return thermoml.ImportThermoMLData.apply(
+        pandas.DataFrame(), thermoml.ImportThermoMLDataSchema(), N_PROCESSES
+    )
+
+
+def main():
+
+    # A local (binary, columnar) copy of ThermoML is cached to avoid re-importing
+    # and re-parsing the full archive each time this script is run.
+    thermoml_data_frame = cached_parquet("thermoml.parquet", import_thermoml_data)
+
+    # Any cached curation stages are invalidated whenever ThermoML is re-imported.
+    thermoml_cache_key = f"thermoml.parquet:{os.path.getmtime('thermoml.parquet')}"
 
     curation_schema = CurationWorkflowSchema(
         component_schemas=[
             # Filter out any measurements made for systems with more than
             # two components
             filtering.FilterByNComponentsSchema(n_components=[1, 2]),
+            # Discard any data points for properties other than those of interest
+            # up front so that the subsequent filters operate on far fewer rows.
+            filtering.FilterByPropertyTypesSchema(
+                property_types=[
+                    "Density",
+                    "EnthalpyOfMixing",
+                ],
+                n_components={
+                    "Density": [1, 2],
+                    "EnthalpyOfMixing": [2],
+                },
+                strict=False,
+            ),
             # Remove any duplicate data.
             filtering.FilterDuplicatesSchema(
                 temperature_precision=1, pressure_precision=0
@@ -167,8 +368,11 @@ def main():
         ]
     )
     # Apply the curation schema to yield the test set.
-    test_set_frame = CurationWorkflow.apply(
-        thermoml_data_frame, curation_schema, N_PROCESSES
+    test_set_frame = apply_curation_components(
+        thermoml_data_frame,
+        curation_schema.component_schemas,
+        N_PROCESSES,
+        thermoml_cache_key,
     )
 
     test_set = DataSet.from_pandas(
@@ -194,14 +398,15 @@ def main():
 
     test_set = test_set.upload()
 
-    os.makedirs("../../schemas/data-sets", exist_ok=True)
+    output_directory = os.path.join("..", "..", "schemas", "data-sets")
+    os.makedirs(output_directory, exist_ok=True)
 
-    test_set.to_pandas().to_csv(
-        os.path.join("../../schemas/data-sets", f"{test_set.id}.csv"), index=False
-    )
-    test_set.to_file(
-        os.path.join("../../schemas/data-sets", f"{test_set.id}.json")
-    )
+    # The data set is converted to a data frame only once for the CSV output, while
+    # the JSON output is serialized directly from the data set model.
+    output_path = os.path.join(output_directory, test_set.id)
+
+    test_set.to_pandas().to_csv(f"{output_path}.csv", index=False)
+    test_set.to_file(f"{output_path}.json")
 
 
 if __name__ == "__main__":
@@ -1,3 +1,5 @@
+import functools
+import itertools
 from typing import Any, Dict, Optional
 
 from nonbonded.library.models.authors import Author
@@ -5,8 +7,53 @@ from nonbonded.library.models.engines import ForceBalance
 from nonbonded.library.models.forcefield import ForceField, Parameter
 from nonbonded.library.models.projects import Benchmark, Optimization, Project, Study
 from nonbonded.library.models.targets import EvaluatorTarget
-from openff.evaluator.forcefield import TLeapForceFieldSource
-from openforcefield.typing.engines.smirnoff import ForceField as SMIRNOFFForceField
+
+# The parameters which will be trained by each of the optimizations.
+_SMIRKS = (
+    "[#1:1]-[#6X4]",
+    "[#6:1]",
+    "[#6X4:1]",
+    "[#8:1]",
+    "[#8X2H0+0:1]",
+    "[#8X2H1+0:1]",
+    "[#1:1]-[#8]",
+    "[#1:1]-[#6X4]-[#7,#8,#9,#16,#17,#35]",
+    "[#1:1]-[#6X3](~[#7,#8,#9,#16,#17,#35])~[#7,#8,#9,#16,#17,#35]",
+)
+_ATTRIBUTE_NAMES = ("epsilon", "rmin_half")
+
+PARAMETERS_TO_TRAIN = [
+    Parameter(handler_type="vdW", attribute_name=attribute_name, smirks=smirks)
+    for attribute_name, smirks in itertools.product(_ATTRIBUTE_NAMES, _SMIRKS)
+]
+
+# The options which are shared by each of the benchmarks.
+_COMMON_BENCHMARK = dict(
+    study_id="benchmark-showcase",
+    project_id="openff-evaluator",
+    test_set_ids=("eval-bench-full",),
+    optimization_id=None,
+    analysis_environments=(),
+)
+
+
+@functools.lru_cache()
+def smirnoff_force_field(file_name: str) -> ForceField:
+    """Loads a SMIRNOFF force field. The (relatively expensive) toolkit import and
+    force field parsing are deferred until a force field is first required."""
+
+    from openforcefield.typing.engines.smirnoff import ForceField as SMIRNOFFForceField
+
+    return ForceField.from_openff(SMIRNOFFForceField(file_name))
+
+
+@functools.lru_cache()
+def tleap_force_field(leap_source: str) -> ForceField:
+    """Defines a force field which will be applied using TLeap."""
+
+    from openff.evaluator.forcefield import TLeapForceFieldSource
+
+    return ForceField(inner_content=TLeapForceFieldSource(leap_source).json())
 
 
 def common_optimization_options(
@@ -15,22 +62,8 @@ def common_optimization_options(
     """Defines the common inputs to the optimizations"""
 
     return dict(
-        force_field=ForceField.from_openff(SMIRNOFFForceField("openff-1.0.0.offxml")),
-        parameters_to_train=[
-            Parameter(handler_type="vdW", attribute_name=attribute_name, smirks=smirks)
-            for attribute_name in ["epsilon", "rmin_half"]
-            for smirks in [
-                "[#1:1]-[#6X4]",
-                "[#6:1]",
-                "[#6X4:1]",
-                "[#8:1]",
-                "[#8X2H0+0:1]",
-                "[#8X2H1+0:1]",
-                "[#1:1]-[#8]",
-                "[#1:1]-[#6X4]-[#7,#8,#9,#16,#17,#35]",
-                "[#1:1]-[#6X3](~[#7,#8,#9,#16,#17,#35])~[#7,#8,#9,#16,#17,#35]",
-            ]
-        ],
+        force_field=smirnoff_force_field("openff-1.0.0.offxml"),
+        parameters_to_train=list(PARAMETERS_TO_TRAIN),
         engine=ForceBalance(
             priors={"vdW/Atom/epsilon": 0.1, "vdW/Atom/rmin_half": 1.0}
         ),
@@ -134,44 +167,26 @@ def main():
                 benchmarks=[
                     Benchmark(
                         id="openff-1-0-0",
-                        study_id="benchmark-showcase",
-                        project_id="openff-evaluator",
                         name="OpenFF 1.0.0",
                         description="An benchmark against the OpenFF 1.0.0 (codename "
                         "parsley) force field.",
-                        test_set_ids=["eval-bench-full"],
-                        optimization_id=None,
-                        force_field=ForceField.from_openff(
-                            SMIRNOFFForceField("openff-1.0.0.offxml")
-                        ),
-                        analysis_environments=[],
+                        force_field=smirnoff_force_field("openff-1.0.0.offxml"),
+                        **_COMMON_BENCHMARK
                     ),
                     Benchmark(
                         id="gaff-1",
-                        study_id="benchmark-showcase",
-                        project_id="openff-evaluator",
                         name="Amber GAFF",
                         description="An benchmark against the Amber GAFF force field.",
-                        test_set_ids=["eval-bench-full"],
-                        optimization_id=None,
-                        force_field=ForceField(
-                            inner_content=TLeapForceFieldSource("leaprc.gaff").json()
-                        ),
-                        analysis_environments=[],
+                        force_field=tleap_force_field("leaprc.gaff"),
+                        **_COMMON_BENCHMARK
                     ),
                     Benchmark(
                         id="gaff-2",
-                        study_id="benchmark-showcase",
-                        project_id="openff-evaluator",
                         name="Amber GAFF 2",
                         description="An benchmark against the Amber GAFF 2 force "
                         "field.",
-                        test_set_ids=["eval-bench-full"],
-                        optimization_id=None,
-                        force_field=ForceField(
-                            inner_content=TLeapForceFieldSource("leaprc.gaff2").json()
-                        ),
-                        analysis_environments=[],
+                        force_field=tleap_force_field("leaprc.gaff2"),
+                        **_COMMON_BENCHMARK
                     ),
                 ],
             ),